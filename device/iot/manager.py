@@ -1,9 +1,9 @@
 # Import standard python modules
-import os, copy, glob, json, shutil, time, datetime
+import os, copy, glob, json, queue, shutil, time, datetime
 import paho.mqtt.client as mqtt
 
 # Import python types
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Tuple, Callable
 
 # Import device utilities
 from device.utilities.statemachine import manager
@@ -60,6 +60,10 @@ class IotManager(manager.StateMachineManager):
         self.received_message_count = 0
         self.published_message_count = 0
 
+        # Initialize message queue, mqtt network thread posts received messages here
+        # so they are processed on the state machine thread
+        self.message_queue: queue.Queue = queue.Queue()
+
         # Initialize pubsub handler
         self.pubsub = PubSub(
             ref_self=self,
@@ -219,7 +223,8 @@ class IotManager(manager.StateMachineManager):
         """Runs init mode."""
         self.logger.debug("Entered INIT")
 
-        # Connect to pubsub service
+        # Connect to pubsub service, stopping any previous client
+        self.pubsub.stop_mqtt_client()
         self.pubsub = PubSub(
             self,
             on_connect,
@@ -276,9 +281,6 @@ class IotManager(manager.StateMachineManager):
         """Runs disconnected mode."""
         self.logger.debug("Entered DISCONNECTED")
 
-        start_time = time.time()
-        update_interval = 1  # seconds
-
         # Loop forever
         while True:
 
@@ -288,14 +290,12 @@ class IotManager(manager.StateMachineManager):
             except:
                 self.pubsub.initialize()
 
-            # Check if connected, transition if so
+            # Check if connected, transition if so, mqtt network thread reconnects
             if self.is_connected:
                 self.mode = modes.CONNECTED
 
-            # Try to reconnect client every update interval
-            if time.time() - start_time > update_interval:
-                self.pubsub.client.reconnect()
-                start_time = time.time()
+            # Process received messages
+            self.check_messages()
 
             # Check for events
             self.check_events()
@@ -331,6 +331,9 @@ class IotManager(manager.StateMachineManager):
             # Update pubsub
             self.pubsub.update()
 
+            # Process received messages
+            self.check_messages()
+
             # Check for events
             self.check_events()
 
@@ -363,7 +366,7 @@ class IotManager(manager.StateMachineManager):
         }
 
         # Publish boot message
-        self.logger.debug("Boot message: {}".format(message))
+        self.logger.debug("Boot message: %s", message)
         self.pubsub.publish_boot_message(message)
 
     def publish_system_summary(self) -> None:
@@ -463,8 +466,9 @@ class IotManager(manager.StateMachineManager):
                 shutil.move(image_file, stored_image_file)
 
         except Exception as e:
-            message = "Unable to publish images, unhandled exception: {}".format(e)
-            self.logger.exception(message)
+            self.logger.exception(
+                "Unable to publish images, unhandled exception: %s", e
+            )
 
     ##### DEVICE EVENT FUNCTIONS #######################################################
 
@@ -498,24 +502,49 @@ class IotManager(manager.StateMachineManager):
 
     #### IOT MESSAGE FUNCTIONS #########################################################
 
+    def check_messages(self) -> None:
+        """Processes messages received by mqtt network thread, first-in-first-out."""
+        while True:
+            try:
+                message = self.message_queue.get_nowait()
+            except queue.Empty:
+                return
+
+            # Keep state machine running if a malformed message raises
+            try:
+                self.process_message(message)
+            except Exception as e:
+                self.logger.exception(
+                    "Unable to process message, unhandled exception: %s", type(e)
+                )
+
     def process_message(self, message: mqtt.MQTTMessage) -> None:
         """Processes messages from iot cloud."""
         self.logger.debug("Processing message")
 
-        # Decode and parse message
+        # Skip empty payloads (e.g. retained configs) and payloads that can not be a
+        # json object without parsing them
+        payload = message.payload
+        if not payload or payload[:1] not in b"{ \t\r\n":
+            self.logger.debug("Not processing message, payload is not a json object")
+            return
+
+        # Parse message, json decodes utf-8 bytes directly
         try:
-            payload = message.payload.decode("utf-8")
             payload_dict = json.loads(payload)
-        except json.decoder.JSONDecodeError:
+        except ValueError:
             self.logger.warning("Unable to process message, payload is invalid json")
-            self.logger.warning("payload = `{}`".format(payload))
+            self.logger.warning("payload = `%s`", payload)
             return
-        except KeyError:
-            self.logger.warning("Unable to get message version, setting to 0")
-            message_version = 0
         except Exception as e:
-            message = "Unable to parse payload, unhandled exception".format(type(e))
-            self.logger.exception(message)
+            self.logger.exception(
+                "Unable to parse payload, unhandled exception: %s", type(e)
+            )
+            return
+
+        # Check payload is a json object, leading whitespace passes the check above
+        if not isinstance(payload_dict, dict):
+            self.logger.warning("Unable to process message, payload is not an object")
             return
 
         # Get message fields
@@ -523,8 +552,7 @@ class IotManager(manager.StateMachineManager):
             command_messages = payload_dict["commands"]
             message_id = payload_dict["messageId"]
         except KeyError as e:
-            message = "Unable to get command messages, `{}` key is required".format(e)
-            self.logger.error(message)
+            self.logger.error("Unable to get command messages, `%s` key is required", e)
             return
 
         # Check if message is old
@@ -546,20 +574,26 @@ class IotManager(manager.StateMachineManager):
         # Get command parameters
         try:
             command = message["command"].upper()  # TODO: Fix this, shouldn't need upper
+        except KeyError as e:
+            self.logger.error("Unable to process command, `%s` key is required", e)
+            return
+
+        # Reject unknown commands before checking their arguments
+        handler = COMMAND_HANDLERS.get(command)
+        if handler is None:
+            self.unknown_command(command)
+            return
+
+        # Get command arguments
+        try:
             arg0 = message["arg0"]
             arg1 = message["arg1"]
         except KeyError as e:
-            error_message = "Unable to process command, `{}` key is required".format(e)
-            self.logger.error(error_message)
+            self.logger.error("Unable to process command, `%s` key is required", e)
             return
 
         # Process command
-        if command == commands.START_RECIPE:
-            self.forcibly_create_and_start_recipe(command, arg0)
-        elif command == commands.STOP_RECIPE:
-            self.stop_recipe(command)
-        else:
-            self.unknown_command(command)
+        handler(self, command, arg0, arg1)
 
     ##### IOT COMMAND FUNCTIONS ########################################################
 
@@ -639,8 +673,7 @@ class IotManager(manager.StateMachineManager):
 
         # Check for start recipe errors
         if status != 202:
-            error_message = "Unable to start recipe, error: {}".format(message)
-            self.logger.warning(error_message)
+            self.logger.warning("Unable to start recipe, error: %s", message)
 
         # Publish command reply
         self.pubsub.publish_command_reply(command, message)
@@ -654,8 +687,7 @@ class IotManager(manager.StateMachineManager):
 
         # Check for stop recipe errors
         if status != 200:
-            error_message = "Unable to stop recipe, error: {}".format(message)
-            self.logger.warning(error_message)
+            self.logger.warning("Unable to stop recipe, error: %s", message)
 
         # Publish command reply
         self.pubsub.publish_command_reply(command, message)
@@ -697,13 +729,13 @@ def on_message(
     # Increment received message count
     ref_self.received_message_count += 1
 
-    # Process message
-    ref_self.process_message(message)
+    # Queue message for state machine thread
+    ref_self.message_queue.put(message)
 
 
 def on_log(client: mqtt.Client, ref_self: IotManager, level: str, buf: str) -> None:
     """Paho callback when mqtt broker receives a log message."""
-    ref_self.logger.debug("Received broker log: '{}' {}".format(buf, level))
+    ref_self.logger.debug("Received broker log: '%s' %s", buf, level)
 
 
 def on_subscribe(
@@ -711,3 +743,27 @@ def on_subscribe(
 ) -> None:
     """Paho callback when mqtt broker receives subscribe."""
     ref_self.logger.debug("Received broker subscribe")
+
+
+##### COMMAND HANDLERS #################################################################
+
+
+def start_recipe_command(
+    ref_self: IotManager, command: str, arg0: Any, arg1: Any
+) -> None:
+    """Handles start recipe command, arg0 is the recipe json."""
+    ref_self.forcibly_create_and_start_recipe(command, arg0)
+
+
+def stop_recipe_command(
+    ref_self: IotManager, command: str, arg0: Any, arg1: Any
+) -> None:
+    """Handles stop recipe command, arguments are unused."""
+    ref_self.stop_recipe(command)
+
+
+# Commands this device acts on, others are replied to as unknown
+COMMAND_HANDLERS: Dict[str, Callable[[IotManager, str, Any, Any], None]] = {
+    commands.START_RECIPE: start_recipe_command,
+    commands.STOP_RECIPE: stop_recipe_command,
+}
@@ -1,5 +1,5 @@
 # Import standard python modules
-import base64, datetime, json, logging, math, os, ssl, sys, time, traceback
+import base64, datetime, json, os, ssl, time
 import paho.mqtt.client as mqtt
 
 # Import python types
@@ -16,6 +16,11 @@ from device.iot import commands
 # Initialize constants
 MQTT_BRIDGE_HOSTNAME = "mqtt.googleapis.com"
 MQTT_BRIDGE_PORT = 443
+MAX_INFLIGHT_MESSAGES = 20  # paho default
+
+# Initialize compact json encoder once, json.dumps builds a new encoder per call
+# whenever non-default options such as separators are passed
+JSON_ENCODER = json.JSONEncoder(separators=(",", ":"))
 
 # Initialize message types
 COMMAND_REPLY_MESSAGE = "CommandReply"
@@ -34,6 +39,8 @@ class PubSub:
 
     # Initialize state
     is_initialized = False
+    is_config_loaded = False
+    is_looping = False
 
     def __init__(
         self,
@@ -65,12 +72,14 @@ class PubSub:
         """Initializes pubsub client."""
         self.logger.debug("Initializing")
         try:
-            self.load_mqtt_config()
+            if not self.is_config_loaded:
+                self.load_mqtt_config()
             self.create_mqtt_client()
             self.is_initialized = True
         except Exception as e:
-            message = "Unable to initialize, unhandled exception: {}".format(type(e))
-            self.logger.exception(message)
+            self.logger.exception(
+                "Unable to initialize, unhandled exception: %s", type(e)
+            )
             self.is_initialized = False
 
     def load_mqtt_config(self) -> None:
@@ -86,10 +95,18 @@ class PubSub:
             self.private_key_filepath = os.environ["IOT_PRIVATE_KEY"]
             self.ca_certs = os.environ["CA_CERTS"]
         except KeyError as e:
-            message = "Unable to load pubsub config, key {} is required".format(e)
-            self.logger.critical(message)
+            self.logger.critical("Unable to load pubsub config, key %s is required", e)
             raise
 
+        # Load private key once, reused for every json web token
+        self.private_key = tokens.load_private_key(self.private_key_filepath)
+
+        # Initialize tls context once, reused by every client and reconnect
+        self.ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLSv1_2)
+        self.ssl_context.verify_mode = ssl.CERT_REQUIRED
+        self.ssl_context.check_hostname = True
+        self.ssl_context.load_verify_locations(self.ca_certs)
+
         # Initialize client id
         self.client_id = "projects/{}/locations/{}/registries/{}/devices/{}".format(
             self.project_id, self.cloud_region, self.registry_id, self.device_id
@@ -105,22 +122,28 @@ class PubSub:
         else:
             self.event_topic = "/devices/{}/events".format(self.device_id)
 
+        # Successfully loaded config, it is invariant so later retries reuse it
+        self.is_config_loaded = True
+
     def create_mqtt_client(self) -> None:
         """Creates an mqtt client. Returns client and assocaited json web token."""
         self.logger.debug("Creating mqtt client")
 
+        # Stop previous client so its network thread does not keep reconnecting
+        self.stop_mqtt_client()
+
         # Initialize client object
         self.client = mqtt.Client(client_id=self.client_id, userdata=self.ref_self)
 
         # Create json web token
         try:
             self.json_web_token = tokens.create_json_web_token(
-                project_id=self.project_id,
-                private_key_filepath=self.private_key_filepath,
+                project_id=self.project_id, private_key=self.private_key
             )
         except Exception as e:
-            message = "Unable to create client, unhandled exception: {}".format(type(e))
-            self.logger.exception(message)
+            self.logger.exception(
+                "Unable to create client, unhandled exception: %s", type(e)
+            )
             return
 
         # Pass json web token to google cloud iot core, note username is ignored
@@ -129,10 +152,10 @@ class PubSub:
         )
 
         # Enable SSL/TLS support
-        self.client.tls_set(ca_certs=self.ca_certs, tls_version=ssl.PROTOCOL_TLSv1_2)
+        self.client.tls_set_context(self.ssl_context)
 
         # Register message callbacks
-        self.client.on_connect = self.on_connect
+        self.client.on_connect = self._on_connect
         self.client.on_disconnect = self.on_disconnect
         self.client.on_message = self.on_message
         self.client.on_publish = self.on_publish
@@ -140,11 +163,52 @@ class PubSub:
         # Connect to the Google MQTT bridge
         self.client.connect(MQTT_BRIDGE_HOSTNAME, MQTT_BRIDGE_PORT)
 
-        # Subscribe to the config topic
-        self.client.subscribe(self.config_topic, qos=1)
+        # Run network loop in its own thread, it handles traffic as it arrives and
+        # reconnects automatically
+        self.client.loop_start()
+        self.is_looping = True
+
+    def stop_mqtt_client(self) -> None:
+        """Stops network thread of mqtt client and disconnects it."""
+        if not self.is_looping:
+            return
+        self.client.disconnect()
+        self.client.loop_stop()
+        self.is_looping = False
+
+    def _on_connect(
+        self, client: mqtt.Client, ref_self: Any, flags: int, return_code: int
+    ) -> None:
+        """Subscribes to the config topic on every connect, subscriptions do not
+        outlive a session, then forwards to connect callback."""
+        if return_code == mqtt.CONNACK_ACCEPTED:
+            client.subscribe(self.config_topic, qos=1)
+        self.on_connect(client, ref_self, flags, return_code)
+
+    def renew_json_web_token(self) -> None:
+        """Renews json web token in place. Bridge closes the connection once the old
+        token expires and the network thread reconnects with the new token."""
+        self.logger.debug("Renewing json web token")
+
+        # Create json web token
+        try:
+            self.json_web_token = tokens.create_json_web_token(
+                project_id=self.project_id, private_key=self.private_key
+            )
+        except Exception as e:
+            self.logger.exception(
+                "Unable to renew token, unhandled exception: %s", type(e)
+            )
+            return
+
+        # Use new token on next connect, bridge only checks credentials on connect
+        self.client.username_pw_set(
+            username="unused", password=self.json_web_token.encoded
+        )
 
     def update(self) -> None:
-        """Updates pubsub client."""
+        """Updates pubsub client. Network traffic is handled by the client's own
+        thread, so this only initializes the client and renews its token."""
 
         # Check if client is initialized
         if not self.is_initialized:
@@ -154,16 +218,9 @@ class PubSub:
             self.initialize()
             return
 
-        # Check if json webtoken is expired, if so renew client
+        # Check if json webtoken is expired, if so renew it
         if self.json_web_token.is_expired:
-            self.create_mqtt_client()  # TODO: Renew instead of re-create
-
-        # Update mqtt client
-        try:
-            self.client.loop()
-        except Exception as e:
-            message = "Unable to update, unhandled exception: {}".format(type(e))
-            self.logger.exception(message)
+            self.renew_json_web_token()
 
     ##### PUBLISH FUNCTIONS ############################################################
 
@@ -177,7 +234,7 @@ class PubSub:
             return
 
         # Publish message
-        message_json = json.dumps(message)
+        message_json = JSON_ENCODER.encode(message)
         self.publish_command_reply(BOOT_MESSAGE, message_json)
 
     def publish_status_message(self, message: Dict) -> None:
@@ -190,7 +247,7 @@ class PubSub:
             return
 
         # Publish message
-        message_json = json.dumps(message)
+        message_json = JSON_ENCODER.encode(message)
         self.publish_command_reply(STATUS_MESSAGE, message_json)
 
     ##### PRIVATE PUBLISH FUNCTIONS? ###################################################
@@ -211,23 +268,21 @@ class PubSub:
             "var": command,
             "values": values,
         }
-        message_json = json.dumps(message)
+        message_json = JSON_ENCODER.encode(message)
 
         # Publish message
         try:
             self.client.publish(self.event_topic, message_json, qos=1)
         except Exception as e:
-            error_message = "Unable to publish command reply, "
-            "unhandled exception: {}".format(type(e))
-            self.logger.exception(error_message)
+            self.logger.exception(
+                "Unable to publish command reply, unhandled exception: %s", type(e)
+            )
 
     def publish_environment_variable(
         self, variable_name: str, values_dict: Dict
     ) -> None:
         """Publish a single environment variable."""
-        self.logger.debug(
-            "Publishing environment variable message: {}".format(variable_name)
-        )
+        self.logger.debug("Publishing environment variable message: %s", variable_name)
         # self.logger.debug("variable_name = {}".format(variable_name))
         # self.logger.debug("values_dict = {}".format(values_dict))
 
@@ -246,33 +301,19 @@ class PubSub:
         if not valid:
             return
 
-        # Build values json
-        # TODO: Change this from string manipulation to dict creation then json.dumps
-        count = 0
-        values_json = "{'values':["
-        for vname in values_dict:
-            val = values_dict[vname]
-
-            if count > 0:
-                values_json += ","
-            count += 1
-
-            if isinstance(val, float):
-                val = "{0:.2f}".format(val)
-                values_json += "{'name':'%s', 'type':'float', 'value':%s}" % (
-                    vname,
-                    val,
-                )
-
-            elif isinstance(val, int):
-                values_json += "{'name':'%s', 'type':'int', 'value':%s}" % (vname, val)
-
+        # Build values, floats are rounded to two decimal places
+        values = []
+        for name, value in values_dict.items():
+            if isinstance(value, float):
+                type_, value = "float", round(value, 2)
+            elif isinstance(value, int):
+                type_ = "int"
             else:  # assume str
-                values_json += "{'name':'%s', 'type':'str', 'value':'%s'}" % (
-                    vname,
-                    val,
-                )
-        values_json += "]}"
+                type_, value = "str", str(value)
+            values.append({"name": name, "type": type_, "value": value})
+
+        # Serialize values, cloud expects them as a json string inside the message
+        values_json = JSON_ENCODER.encode({"values": values})
 
         # Initialize publish message
         message = {
@@ -283,12 +324,13 @@ class PubSub:
 
         # Publish message
         try:
-            message_json = json.dumps(message)
+            message_json = JSON_ENCODER.encode(message)
             self.client.publish(self.event_topic, message_json, qos=1)
         except Exception as e:
-            error_message = "Unable to publish environment variables, "
-            "unhandled exception: {}".format(type(e))
-            self.logger.exception(error_message)
+            self.logger.exception(
+                "Unable to publish environment variables, unhandled exception: %s",
+                type(e),
+            )
 
     def publish_binary_image(
         self, variable_name: str, image_type: str, image_bytes: bytes
@@ -306,15 +348,17 @@ class PubSub:
 
         # Check variable name is valid
         if variable_name == None or len(variable_name) == 0:
-            error_message = "Unable to publish binary image, variable name "
-            "`{}` is invalid".format(variable_name)
+            error_message = (
+                "Unable to publish binary image, variable name `{}` is invalid"
+            ).format(variable_name)
             self.logger.error(error_message)
             raise ValueError(error_message)
 
         # Check image type is valid
         if image_type == None or image_type == 0:
-            error_message = "Unable to publish binary image, image type  "
-            "`{}` is invalid".format(image_type)
+            error_message = (
+                "Unable to publish binary image, image type `{}` is invalid"
+            ).format(image_type)
             self.logger.error(error_message)
             raise ValueError(error_message)
 
@@ -325,26 +369,22 @@ class PubSub:
             raise ValueError(error_message)
 
         try:
-            # Encode image bytes
-            base64_bytes = base64.b64encode(image_bytes)
+            # Encode image bytes, decoded once so chunks are plain string slices
+            base64_string = base64.b64encode(image_bytes).decode("ascii")
             max_message_size = 240 * 1024  # < 256K
-            image_size = len(base64_bytes)
-            total_chunks = math.ceil(image_size / max_message_size)
-            image_start_index = 0
-            image_end_index = image_size
-            if image_size > max_message_size:
-                image_end_index = max_message_size
+            image_size = len(base64_string)
+            total_chunks = (image_size + max_message_size - 1) // max_message_size
 
             # Send all messages with the same ID (for tracking and assembly)
             message_id = time.time()
 
-            # make a mutable byte array of the image data
-            image_byte_array = bytearray(base64_bytes)
-
-            # break image into messages < 256K
-            for chunk in range(0, total_chunks):
-
-                image_chunk = bytes(image_byte_array[image_start_index:image_end_index])
+            # Break image into messages < 256K, all messages are built before
+            # publishing so they can be sent back to back
+            messages_json = []
+            for chunk in range(total_chunks):
+                image_start_index = chunk * max_message_size
+                image_end_index = image_start_index + max_message_size
+                image_chunk = base64_string[image_start_index:image_end_index]
 
                 message = {
                     "messageType": IMAGE_MESSAGE,
@@ -353,31 +393,30 @@ class PubSub:
                     "imageType": image_type,
                     "chunk": chunk,
                     "totalChunks": total_chunks,
-                    "imageChunk": image_chunk.decode("utf-8"),
+                    "imageChunk": image_chunk,
                 }
 
-                # Publish this chunk
-                message_json = json.dumps(message)
-                self.client.publish(self.event_topic, message_json, qos=1)
+                # Build this chunk
+                messages_json.append(JSON_ENCODER.encode(message))
 
-                chunk_num_bytes = len(image_chunk.decode("utf-8"))
-                # len(message["imageChunk"]
-                self.logger.debug(
-                    "Publishing binary image, sent image chunk "
-                    "{} of {} for {} in {} bytes".format(
-                        chunk, total_chunks, variable_name, chunk_num_bytes
-                    )
-                )
-
-                # For next chunk, start at the ending index
-                image_start_index = image_end_index
-                image_end_index = image_size  # is this the last chunk?
-
-                # If we have more than one chunk to go, send the max
-                if image_size - image_start_index > max_message_size:
-                    image_end_index = image_start_index + max_message_size
+            # Let every chunk be in flight at once instead of queueing behind the
+            # default limit, then publish chunks in a tight loop
+            self.client.max_inflight_messages_set(
+                max(total_chunks, MAX_INFLIGHT_MESSAGES)
+            )
+            try:
+                for message_json in messages_json:
+                    self.client.publish(self.event_topic, message_json, qos=1)
+            finally:
+                self.client.max_inflight_messages_set(MAX_INFLIGHT_MESSAGES)
+            self.logger.debug(
+                "Publishing binary image, sent %s image chunks for %s in %s bytes",
+                total_chunks,
+                variable_name,
+                image_size,
+            )
 
         except Exception as e:
-            error_message = "Unable to publish binary image, unhandled "
-            "exception: {}".format(type(e))
-            self.logger.exception(error_message)
+            self.logger.exception(
+                "Unable to publish binary image, unhandled exception: %s", type(e)
+            )
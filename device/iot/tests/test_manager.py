@@ -1,5 +1,9 @@
 # Import standard python libraries
 import os, sys, pytest, time
+import paho.mqtt.client as mqtt
+
+# Import python types
+from typing import List
 
 # Set system path
 sys.path.append(os.environ["PROJECT_ROOT"])
@@ -18,3 +22,76 @@ def test_init() -> None:
     state = State()
     recipe = RecipeManager(state)
     iot = manager.IotManager(state, recipe)
+
+
+def test_process_message_skips_non_json_payloads() -> None:
+    state = State()
+    recipe = RecipeManager(state)
+    iot = manager.IotManager(state, recipe)
+    iot.prev_message_id = "previous"
+    for payload in [b"", b"junk", b"{junk", b" []", b"\n5"]:
+        message = mqtt.MQTTMessage()
+        message.payload = payload
+        iot.process_message(message)
+    assert iot.prev_message_id == "previous"
+
+
+def test_process_message_records_message_id() -> None:
+    state = State()
+    recipe = RecipeManager(state)
+    iot = manager.IotManager(state, recipe)
+    message = mqtt.MQTTMessage()
+    message.payload = b'{"messageId": "new", "commands": []}'
+    iot.process_message(message)
+    assert iot.prev_message_id == "new"
+
+
+def test_process_command_message_unknown_command() -> None:
+    state = State()
+    recipe = RecipeManager(state)
+    iot = manager.IotManager(state, recipe)
+    unknown_commands: List[str] = []
+    iot.unknown_command = unknown_commands.append  # type: ignore
+    iot.process_command_message({"command": "junk"})
+    assert unknown_commands == ["JUNK"]
+
+
+def test_process_command_message_dispatches_stop_recipe() -> None:
+    state = State()
+    recipe = RecipeManager(state)
+    iot = manager.IotManager(state, recipe)
+    stopped_commands: List[str] = []
+    iot.stop_recipe = stopped_commands.append  # type: ignore
+    message = {"command": "stop_recipe", "arg0": "{}", "arg1": "0"}
+    iot.process_command_message(message)
+    assert stopped_commands == ["STOP_RECIPE"]
+
+
+def test_check_messages_processes_queued_messages() -> None:
+    state = State()
+    recipe = RecipeManager(state)
+    iot = manager.IotManager(state, recipe)
+    message = mqtt.MQTTMessage()
+    message.payload = b'{"messageId": "queued", "commands": []}'
+    manager.on_message(None, iot, message)
+    assert iot.prev_message_id != "queued"
+    iot.check_messages()
+    assert iot.prev_message_id == "queued"
+    assert iot.message_queue.empty()
+
+
+def test_check_messages_survives_malformed_messages() -> None:
+    state = State()
+    recipe = RecipeManager(state)
+    iot = manager.IotManager(state, recipe)
+    for payload in [
+        b'{"commands": 5, "messageId": 1}',
+        b'{"commands": [{"command": 5}], "messageId": 2}',
+        b'{"messageId": "after", "commands": []}',
+    ]:
+        message = mqtt.MQTTMessage()
+        message.payload = payload
+        manager.on_message(None, iot, message)
+    iot.check_messages()
+    assert iot.prev_message_id == "after"
+    assert iot.message_queue.empty()
@@ -1,12 +1,16 @@
 # Import standard python libraries
-import os, sys, pytest, time
+import base64, json, os, sys, pytest, time
 import paho.mqtt.client as mqtt
 
+# Import python types
+from typing import Any, List
+
 # Set system path
 sys.path.append(os.environ["PROJECT_ROOT"])
 
 # Import device utilities
 from device.utilities.state.main import State
+from device.utilities.iot import tokens
 
 # Import device managers
 from device.recipe.manager import RecipeManager
@@ -50,7 +54,7 @@ def on_message(
 
 def on_log(client: mqtt.Client, ref_self: IotManager, level: str, buf: str) -> None:
     """Paho callback when mqtt broker receives a log message."""
-    ref_self.logger.debug("Received broker log: '{}' {}".format(buf, level))
+    ref_self.logger.debug("Received broker log: '%s' %s", buf, level)
 
 
 def on_subscribe(
@@ -73,3 +77,108 @@ def test_init() -> None:
         on_subscribe=on_subscribe,
         on_log=on_log,
     )
+
+
+class RecordingClient:
+    """Mqtt client stand-in that records published payloads."""
+
+    def __init__(self) -> None:
+        self.payloads: List[str] = []
+        self.max_inflight_messages = 20
+        self.password = ""
+        self.reconnect_count = 0
+        self.subscriptions: List[str] = []
+
+    def username_pw_set(self, username: str, password: str) -> None:
+        self.password = password
+
+    def reconnect(self) -> None:
+        self.reconnect_count += 1
+
+    def subscribe(self, topic: str, qos: int = 0) -> None:
+        self.subscriptions.append(topic)
+
+    def max_inflight_messages_set(self, inflight: int) -> None:
+        self.max_inflight_messages = inflight
+
+    def publish(self, topic: str, payload: str, qos: int = 0) -> None:
+        self.payloads.append(payload)
+
+
+def create_recording_pubsub() -> Any:
+    state = State()
+    recipe = RecipeManager(state)
+    iot = IotManager(state, recipe)
+    pubsub = PubSub(
+        ref_self=iot,
+        on_connect=on_connect,
+        on_disconnect=on_disconnect,
+        on_publish=on_publish,
+        on_message=on_message,
+        on_subscribe=on_subscribe,
+        on_log=on_log,
+    )
+    pubsub.client = RecordingClient()
+    pubsub.event_topic = "/devices/test/events"
+    pubsub.is_initialized = True
+    return pubsub
+
+
+def test_update_renews_expired_token_in_place(monkeypatch: Any) -> None:
+    pubsub = create_recording_pubsub()
+    client = pubsub.client
+    pubsub.project_id = "project"
+    pubsub.private_key = None
+    pubsub.config_topic = "/devices/test/config"
+    pubsub.json_web_token = tokens.JsonWebToken("old", 0.0, 0.0, 0.0)
+    renewed_token = tokens.JsonWebToken("new", 0.0, 0.0, time.monotonic() + 3600)
+    monkeypatch.setattr(tokens, "create_json_web_token", lambda **kwargs: renewed_token)
+    pubsub.update()
+    assert pubsub.client is client
+    assert client.password == "new"
+    assert client.reconnect_count == 0
+
+
+def test_on_connect_subscribes_to_config_topic() -> None:
+    pubsub = create_recording_pubsub()
+    pubsub.config_topic = "/devices/test/config"
+    pubsub._on_connect(pubsub.client, pubsub.ref_self, 0, mqtt.CONNACK_ACCEPTED)
+    assert pubsub.client.subscriptions == ["/devices/test/config"]
+    assert pubsub.ref_self.is_connected
+
+
+def test_publish_binary_image_chunks() -> None:
+    pubsub = create_recording_pubsub()
+    image_bytes = os.urandom(500 * 1024)
+    pubsub.publish_binary_image("camera", "png", image_bytes)
+    messages = [json.loads(payload) for payload in pubsub.client.payloads]
+    assert len(messages) == 3
+    assert [message["chunk"] for message in messages] == [0, 1, 2]
+    assert all(message["totalChunks"] == 3 for message in messages)
+    image_chunks = "".join(message["imageChunk"] for message in messages)
+    assert base64.b64decode(image_chunks) == image_bytes
+    assert pubsub.client.max_inflight_messages == 20
+
+
+def test_publish_environment_variable() -> None:
+    pubsub = create_recording_pubsub()
+    values_dict = {"temperature": 21.456, "count": 3, "status": "ok"}
+    pubsub.publish_environment_variable("sensors", values_dict)
+    message = json.loads(pubsub.client.payloads[0])
+    assert message["var"] == "sensors"
+    assert json.loads(message["values"]) == {
+        "values": [
+            {"name": "temperature", "type": "float", "value": 21.46},
+            {"name": "count", "type": "int", "value": 3},
+            {"name": "status", "type": "str", "value": "ok"},
+        ]
+    }
+
+
+def test_publish_binary_image_exact_chunk_multiple() -> None:
+    pubsub = create_recording_pubsub()
+    image_bytes = os.urandom(2 * 180 * 1024)  # encodes to exactly two chunks
+    pubsub.publish_binary_image("camera", "png", image_bytes)
+    messages = [json.loads(payload) for payload in pubsub.client.payloads]
+    assert len(messages) == 2
+    assert all(len(message["imageChunk"]) == 240 * 1024 for message in messages)
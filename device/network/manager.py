@@ -1,8 +1,21 @@
 # Import standard python modules
-import os, time
+import asyncio, concurrent.futures, os, platform, selectors, socket, struct
+import threading, time
+import async_timeout
 
 # Import python types
-from typing import Dict, Any, Tuple, List
+from typing import (
+    Dict,
+    Any,
+    Tuple,
+    List,
+    Optional,
+    Set,
+    Callable,
+    Coroutine,
+    FrozenSet,
+    TypeVar,
+)
 
 # Import device utilities
 from device.utilities import logger
@@ -17,6 +30,35 @@ from device.utilities.network.network_utility_factory import NetworkUtilityFacto
 # Import manager elements
 from device.network import modes
 
+# Initialize types
+T = TypeVar("T")
+
+# Initialize platform constants, environment does not change while running
+IS_RASPBERRY_PI = "raspberry-pi" in str(os.getenv("PLATFORM"))
+
+# Initialize wifi ssids cache time-to-live, refetched sooner if connection changes
+WIFI_SSIDS_CACHE_TTL = 30  # seconds
+
+# Initialize message for wifi requests received after manager is closed
+CLOSED_MESSAGE = "Network manager is shut down"
+
+# Initialize netlink multicast groups for link and ipv4 address changes
+RTMGRP_LINK = 0x1
+RTMGRP_IPV4_IFADDR = 0x10
+
+# Initialize minimum time between netlink triggered connection updates, wireless
+# scan and association events arrive in bursts
+NETLINK_UPDATE_MIN_INTERVAL = 10  # seconds
+
+# Initialize netlink message layouts, header is (length, type, flags, sequence,
+# port id) and attributes are (length, type), both padded to 4 bytes
+NETLINK_HEADER = struct.Struct("=IHHII")
+NETLINK_ATTRIBUTE = struct.Struct("=HH")
+IFINFO_SIZE = 16
+RTM_NEWLINK = 16
+RTM_DELLINK = 17
+IFLA_WIRELESS = 11
+
 
 class NetworkManager(manager.StateMachineManager):
     """Manages network connections."""
@@ -32,6 +74,16 @@ class NetworkManager(manager.StateMachineManager):
         # Initialize parameters
         self.state = state
 
+        # Cache shared network state reference, hot keys always exist so getters can
+        # index directly instead of falling back to defaults. Network state has its
+        # own lock so updates do not contend with other managers on state.lock
+        self._net = state.network
+        self._network_lock = state.network_lock
+        with self._network_lock:
+            self._net.setdefault("is_connected", False)
+            self._net.setdefault("wifi_ssids", [])
+            self._net.setdefault("ip_address", "UNKNOWN")
+
         # Initialize logger
         self.logger = logger.Logger("NetworkManager", "network")
         self.logger.debug("Initializing manager")
@@ -40,75 +92,123 @@ class NetworkManager(manager.StateMachineManager):
         self.status = "Initializing"
 
         # Initialize state machine transitions
-        self.transitions: Dict[str, List[str]] = {
-            modes.CONNECTED: [modes.DISCONNECTED, modes.SHUTDOWN, modes.ERROR],
-            modes.DISCONNECTED: [modes.CONNECTED, modes.SHUTDOWN, modes.ERROR],
-            modes.ERROR: [modes.SHUTDOWN],
+        self.transitions: Dict[str, FrozenSet[str]] = {
+            modes.CONNECTED: frozenset(
+                {modes.DISCONNECTED, modes.SHUTDOWN, modes.ERROR}
+            ),
+            modes.DISCONNECTED: frozenset(
+                {modes.CONNECTED, modes.SHUTDOWN, modes.ERROR}
+            ),
+            modes.ERROR: frozenset({modes.SHUTDOWN}),
         }
 
         # Initialize raspberry pi access point mode
-        # if "raspberry-pi" in str(os.getenv("PLATFORM")):
+        # if IS_RASPBERRY_PI:
         #    self._disable_raspi_access_point()
 
         self.network_utilities = NetworkUtilityFactory.get_network_utils()
 
+        # Initialize wake condition, lets run loops sleep until an update is due
+        self._wake = threading.Condition()
+        self._wake_pending = False
+
+        # Initialize transition mailbox, modes requested from other threads are
+        # delivered here and applied by the run loop as soon as it wakes
+        self._pending_mode: Optional[str] = None
+
+        # Initialize netlink socket on linux, kernel pushes link and address changes
+        # so connection is re-evaluated immediately instead of waiting for next poll
+        self._netlink = self._open_netlink_socket()
+
+        # Initialize update request flag, forces connection update on next wake
+        self._update_requested = False
+
+        # Initialize netlink change flags and last connection update time, netlink
+        # changes pull the next update in but no sooner than the minimum interval.
+        # Link flag is only set for link changes, not address or wireless events
+        self._netlink_changed = False
+        self._netlink_link_changed = False
+        self._last_update_time = float("-inf")
+
+        # Use an eventfd for wakeups on linux when available (python 3.10+), a single
+        # syscall round trip instead of the condition's timed wait. Fall back to a pipe
+        # when netlink is open so both can be waited on together
+        self._wake_fd: Optional[int] = None
+        self._wake_write_fd: Optional[int] = None
+        if platform.system() == "Linux" and hasattr(os, "eventfd"):
+            flags = os.EFD_NONBLOCK | os.EFD_CLOEXEC  # type: ignore
+            self._wake_fd = os.eventfd(0, flags)  # type: ignore
+        elif self._netlink is not None:
+            self._wake_fd, self._wake_write_fd = os.pipe()
+            os.set_blocking(self._wake_fd, False)
+            os.set_blocking(self._wake_write_fd, False)
+
+        # Initialize wake selector over wake fd and netlink socket
+        self._selector: Optional[selectors.BaseSelector] = None
+        if self._wake_fd is not None:
+            self._selector = selectors.DefaultSelector()
+            self._selector.register(self._wake_fd, selectors.EVENT_READ, "wake")
+            if self._netlink is not None:
+                self._selector.register(self._netlink, selectors.EVENT_READ, "netlink")
+
+        # Initialize network cache of (timestamp, value) pairs, avoids re-running
+        # slow network utility calls every connection update
+        self._network_cache: Dict[str, Tuple[float, Any]] = {}
+        self._invalidate_network_cache()
+
+        # Initialize event loop for wifi event handlers, runs in its own thread so
+        # concurrent requests wait cooperatively instead of each blocking a thread
+        self._loop = asyncio.new_event_loop()
+        self._loop_lock = threading.Lock()
+        self._loop_futures: Set[concurrent.futures.Future] = set()
+        self._loop_thread = threading.Thread(target=self._loop.run_forever)
+        self._loop_thread.daemon = True
+        self._loop_thread.start()
+
+        # Initialize state machine mode handlers
+        self._mode_handlers: Dict[str, Callable[[], None]] = {
+            modes.CONNECTED: self.run_connected_mode,
+            modes.DISCONNECTED: self.run_disconnected_mode,
+            modes.ERROR: self.run_error_mode,  # defined in parent class
+            modes.SHUTDOWN: self.run_shutdown_mode,  # defined in parent class
+        }
+
         # Initialize state machine mode
         self.mode = modes.DISCONNECTED
 
     @property
     def is_connected(self) -> bool:
         """Gets internet connection status."""
-        return self.state.network.get("is_connected", False)
+        return self._net["is_connected"]  # type: ignore
 
     @is_connected.setter
     def is_connected(self, value: bool) -> None:
         """Sets connection status, updates reconnection status, and logs changes."""
+        self._track_connection(value)
+        self._update_state_batch(is_connected=value)
 
-        # Set previous and current connection state
-        prev_connected = self._connected
-        self._connected = value
-
-        # Check for new connection
-        if prev_connected != self._connected and self._connected:
-            self.logger.info("Connected to internet")
-            self.reconnected = True
-            self.mode = modes.CONNECTED
-
-        # Check for new disconnection
-        elif prev_connected != self._connected and not self._connected:
-            self.logger.info("Disconnected from internet")
-            self.reconnected = False
-            self.mode = modes.DISCONNECTED
-
-        # No change to connection
-        else:
-            self.reconnected = False
-
-        # Update connection status in shared state
-        with self.state.lock:
-            self.state.network["is_connected"] = value
+        # Wake state machine so it can react to the new status
+        self._notify_wake()
 
     @property
     def wifi_ssids(self) -> List[Dict[str, str]]:
         """Gets value."""
-        return self.state.network.get("wifi_ssids")  # type: ignore
+        return self._net["wifi_ssids"]  # type: ignore
 
     @wifi_ssids.setter
     def wifi_ssids(self, value: List[Dict[str, str]]) -> None:
         """Safely updates value in shared state."""
-        with self.state.lock:
-            self.state.network["wifi_ssids"] = value
+        self._update_state_batch(wifi_ssids=value)
 
     @property
     def ip_address(self) -> str:
         """Gets value."""
-        return self.state.network.get("ip_address")  # type: ignore
+        return self._net["ip_address"]  # type: ignore
 
     @ip_address.setter
     def ip_address(self, value: str) -> None:
         """Safely updates value in shared state."""
-        with self.state.lock:
-            self.state.network["ip_address"] = value
+        self._update_state_batch(ip_address=value)
 
     @property
     def access_point_enabled(self) -> bool:
@@ -118,8 +218,7 @@ class NetworkManager(manager.StateMachineManager):
     @access_point_enabled.setter
     def access_point_enabled(self, value: bool) -> None:
         """Safely updates value in shared state."""
-        with self.state.lock:
-            self.state.network["access_point_enabled"] = value
+        self._update_state_batch(access_point_enabled=value)
 
     ##### EXTERNAL STATE DECORATORS ####################################################
 
@@ -146,45 +245,54 @@ class NetworkManager(manager.StateMachineManager):
                 break
 
             # Check for mode transitions
-            if self.mode == modes.CONNECTED:
-                self.run_connected_mode()
-            elif self.mode == modes.DISCONNECTED:
-                self.run_disconnected_mode()
-            elif self.mode == modes.ERROR:
-                self.run_error_mode()  # defined in parent classs
-            elif self.mode == modes.SHUTDOWN:
-                self.run_shutdown_mode()  # defined in parent class
-            else:
+            handler = self._mode_handlers.get(self.mode)
+            if handler is None:
                 self.logger.critical("Invalid state machine mode")
                 self.mode = modes.INVALID
                 self.is_shutdown = True
                 break
+            handler()
+
+        # Release event loop thread and file descriptors
+        self.close()
 
     def run_connected_mode(self) -> None:
         """Runs normal mode."""
         self.logger.info("Entered CONNECTED")
 
         # Initialize timing variables
-        last_update_time = 0.0
+        next_update_deadline = 0.0
         update_interval = 300  # seconds -> 5 minutes
+        now = time.monotonic
+
+        # Bind loop lookups to locals
+        check_events = self.check_events
+        new_transition = self.new_transition
+        take_pending_mode = self._take_pending_mode
+        next_update_time = self._next_update_time
 
         # Loop forever
         while True:
 
-            # Update connection and storage state every update interval
-            if time.time() - last_update_time > update_interval:
-                last_update_time = time.time()
+            # Update connection and storage state every update interval, when
+            # requested, or when netlink reports a link change
+            update_time = next_update_time(next_update_deadline)
+            if self._update_requested or now() >= update_time:
+                self._update_requested = False
+                next_update_deadline = now() + update_interval
                 self.update_connection()
 
-            # Check for network disconnect
-            if not self.is_connected:
-                self.mode = modes.DISCONNECTED
+            # Apply transitions delivered to mailbox, e.g. network disconnect. Applied
+            # before events so a queued shutdown always wins
+            pending_mode = take_pending_mode()
+            if pending_mode is not None:
+                self.mode = pending_mode
 
             # Check for events
-            self.check_events()
+            check_events()
 
             # Check for transitions
-            if self.new_transition(modes.CONNECTED):
+            if new_transition(modes.CONNECTED):
                 break
 
             # Check for raspberry pi successful initial network connection event
@@ -196,7 +304,7 @@ class NetworkManager(manager.StateMachineManager):
             # connected to the iot cloud. The device can only connect to the iot cloud
             # once it is associated with a user account (which happens by entering the
             # iot access code in the cloud ui or clicking on the iot access link)
-            # if "raspberry-pi" in str(os.getenv("PLATFORM")):
+            # if IS_RASPBERRY_PI:
             #     if (
             #         self.iot_is_registered
             #         and not self.iot_is_connected
@@ -214,82 +322,349 @@ class NetworkManager(manager.StateMachineManager):
             #         # Update connection information
             #         self.update_connection()
 
-            # Update every 100ms
-            time.sleep(0.1)
+            # Sleep until next update is due or until woken by a state change
+            timeout = next_update_time(next_update_deadline) - now()
+            self._wait_for_wake(max(0, timeout))
 
     def run_disconnected_mode(self) -> None:
         """Runs normal mode."""
         self.logger.info("Entered DISCONNECTED")
 
         # Initialize timing variables
-        last_update_time = 0.0
+        next_update_deadline = 0.0
         update_interval = 5  # seconds
+        now = time.monotonic
+
+        # Bind loop lookups to locals
+        check_events = self.check_events
+        new_transition = self.new_transition
+        take_pending_mode = self._take_pending_mode
+        next_update_time = self._next_update_time
 
         # Loop forever
         while True:
 
-            # Update connection and storage state every update interval
-            if time.time() - last_update_time > update_interval:
-                last_update_time = time.time()
+            # Update connection and storage state every update interval, when
+            # requested, or when netlink reports a link change
+            update_time = next_update_time(next_update_deadline)
+            if self._update_requested or now() >= update_time:
+                self._update_requested = False
+                next_update_deadline = now() + update_interval
                 self.update_connection()
 
-            # Check for network connect
-            if self.is_connected:
-                self.mode = modes.CONNECTED
+            # Apply transitions delivered to mailbox, e.g. network connect. Applied
+            # before events so a queued shutdown always wins
+            pending_mode = take_pending_mode()
+            if pending_mode is not None:
+                self.mode = pending_mode
 
             # Check for events
-            self.check_events()
+            check_events()
 
             # Check for transitions
-            if self.new_transition(modes.DISCONNECTED):
+            if new_transition(modes.DISCONNECTED):
                 break
 
             # Check if raspi access point is disabled but device not registered (and network
             # disconnected)
-            # if "raspberry-pi" in str(os.getenv("PLATFORM")):
+            # if IS_RASPBERRY_PI:
             #     if not self.iot_is_registered and not self.access_point_enabled:
             #
             #         # Re-enable access point
             #         self._enable_raspi_access_point()
 
-            # Update every 100ms
-            time.sleep(0.1)
+            # Sleep until next update is due or until woken by a state change
+            timeout = next_update_time(next_update_deadline) - now()
+            self._wait_for_wake(max(0, timeout))
 
         # TODO: SRMoore: DO we need this in Balena?
         # If completing raspi registration, give the iot manager enough time to
         # establish a new connection
-        if "raspberry-pi" in str(os.getenv("PLATFORM")) and self.iot_is_registered:
+        if IS_RASPBERRY_PI and self.iot_is_registered:
+            coroutine = self._wait_for_iot_connection(timeout=120)
+            self._run_coroutine(coroutine, None)  # type: ignore
+
+    ##### HELPER FUNCTIONS #############################################################
+
+    def _wait_for_wake(self, timeout: float) -> None:
+        """Blocks until woken by a state change or until timeout elapses."""
+
+        # Wait on wake fd and netlink socket if enabled, reading clears wakeups
+        if self._selector is not None:
+            for key, _ in self._selector.select(max(timeout, 0)):
+                if key.data == "netlink":
+                    if self._drain_netlink():
+                        self._netlink_link_changed = True
+                    self._netlink_changed = True
+                else:
+                    os.read(key.fd, 4096)
+            return
+
+        # Otherwise wait on condition
+        with self._wake:
+            if not self._wake_pending:
+                self._wake.wait(timeout=max(timeout, 0))
+            self._wake_pending = False
+
+    def _notify_wake(self) -> None:
+        """Wakes state machine loop so it re-checks state immediately. Holds wake
+        lock so wake fds are not closed mid write."""
+        with self._wake:
+            if self._wake_write_fd is not None:
+                try:
+                    os.write(self._wake_write_fd, b"\0")
+                except BlockingIOError:
+                    pass  # pipe full, wakeup already pending
+            elif self._wake_fd is not None:
+                os.eventfd_write(self._wake_fd, 1)  # type: ignore
+            else:
+                self._wake_pending = True
+                self._wake.notify()
+
+    def close(self) -> None:
+        """Stops event loop thread and closes wake fds, netlink socket, and wake
+        selector. Safe to call more than once."""
+
+        # Stop event loop thread, then cancel unfinished coroutines and give them a
+        # moment to unwind before closing loop
+        with self._loop_lock:
+            if not self._loop.is_closed():
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._loop_thread.join()
+                all_tasks = getattr(asyncio, "all_tasks", None)  # python 3.7+
+                tasks = (all_tasks or asyncio.Task.all_tasks)(self._loop)
+                for task in tasks:
+                    task.cancel()
+                if tasks:
+                    self._loop.run_until_complete(self._wait_for_tasks(tasks, 1))
+                self._loop.close()
+
+            # Release threads still waiting on coroutines that ignored cancellation
+            for future in list(self._loop_futures):
+                if not future.done():
+                    future.set_exception(concurrent.futures.CancelledError())
+
+        # Close file descriptors, later wakeups fall back to wake condition
+        with self._wake:
+            if self._selector is not None:
+                self._selector.close()
+                self._selector = None
+            for fd in (self._wake_fd, self._wake_write_fd):
+                if fd is not None:
+                    os.close(fd)
+            self._wake_fd = None
+            self._wake_write_fd = None
+            if self._netlink is not None:
+                self._netlink.close()
+                self._netlink = None
+
+    def _open_netlink_socket(self) -> Optional[socket.socket]:
+        """Opens non-blocking netlink route socket subscribed to link and address
+        changes. Returns None if netlink is unavailable."""
+        if not hasattr(socket, "AF_NETLINK"):
+            return None
+        try:
+            netlink = socket.socket(
+                socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE  # type: ignore
+            )
+            netlink.bind((0, RTMGRP_LINK | RTMGRP_IPV4_IFADDR))
+            netlink.setblocking(False)
+        except OSError as e:
+            self.logger.debug("Unable to open netlink socket: {}".format(e))
+            return None
+        return netlink
+
+    def _drain_netlink(self) -> bool:
+        """Drains pending netlink messages. Returns True if any message reports a link
+        change, wireless events such as scan results are not counted."""
+        link_changed = False
+        while True:
+            try:
+                data = self._netlink.recv(65536)  # type: ignore
+            except OSError:
+                return link_changed
+
+            # Walk messages in datagram, stops at a truncated or malformed message
+            offset = 0
+            while offset + NETLINK_HEADER.size <= len(data):
+                length, type_, _, _, _ = NETLINK_HEADER.unpack_from(data, offset)
+                if length < NETLINK_HEADER.size:
+                    break
+                if type_ in (RTM_NEWLINK, RTM_DELLINK):
+                    start = offset + NETLINK_HEADER.size + IFINFO_SIZE
+                    end = min(offset + length, len(data))
+                    if not self._has_netlink_attribute(data, start, end, IFLA_WIRELESS):
+                        link_changed = True
+                offset += (length + 3) & ~3
+
+    def _has_netlink_attribute(
+        self, data: bytes, start: int, end: int, type_: int
+    ) -> bool:
+        """Checks if netlink attributes in data between start and end include type."""
+        while start + NETLINK_ATTRIBUTE.size <= end:
+            length, attribute_type = NETLINK_ATTRIBUTE.unpack_from(data, start)
+            if attribute_type == type_:
+                return True
+            if length < NETLINK_ATTRIBUTE.size:
+                return False
+            start += (length + 3) & ~3
+        return False
+
+    def _next_update_time(self, deadline: float) -> float:
+        """Gets time of next connection update. A pending netlink change moves the
+        deadline in, no sooner than minimum interval after the last update."""
+        if not self._netlink_changed:
+            return deadline
+        return min(deadline, self._last_update_time + NETLINK_UPDATE_MIN_INTERVAL)
+
+    def _request_update(self) -> None:
+        """Requests an immediate connection update from state machine loop."""
+        self._update_requested = True
+        self._notify_wake()
+
+    def _request_transition(self, mode: str) -> None:
+        """Delivers mode to transition mailbox and wakes state machine to apply it."""
+        with self._wake:
+            self._pending_mode = mode
+        self._notify_wake()
+
+    def _take_pending_mode(self) -> Optional[str]:
+        """Takes mode from transition mailbox, returns None if no mode is pending."""
+        with self._wake:
+            mode, self._pending_mode = self._pending_mode, None
+        return mode
+
+    def _run_coroutine(self, coroutine: Coroutine[Any, Any, T], default: T) -> T:
+        """Runs coroutine on event loop thread, blocks until it completes. Returns
+        default if manager is closed before coroutine completes. Callers ignore types
+        since mypy 0.600 infers async calls as awaitables."""
+        with self._loop_lock:
+            if self._loop.is_closed():
+                coroutine.close()
+                return default
+            future = asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+            self._loop_futures.add(future)
+        try:
+            return future.result()
+        except concurrent.futures.CancelledError:
+            return default
+        finally:
+            self._loop_futures.discard(future)
+
+    async def _wait_for_tasks(self, tasks: Set[asyncio.Task], timeout: float) -> None:
+        """Waits for tasks to finish, gives up after timeout."""
+        await asyncio.wait(tasks, timeout=timeout)
+
+    async def _run_blocking(self, function: Callable[..., T], *args: Any) -> T:
+        """Runs blocking function in executor so event loop is not blocked."""
+        return await self._loop.run_in_executor(None, function, *args)
+
+    async def _wait_for_connection(
+        self, desired: bool, timeout: float
+    ) -> Optional[str]:
+        """Waits for internet connection status to reach desired value. Returns None on
+        success, otherwise returns timeout message."""
+        is_connected = self.network_utilities.is_connected
+        action = "connect to" if desired else "disconnect from"
+        try:
+            async with async_timeout.timeout(timeout):
+                while await self._run_blocking(is_connected) != desired:
+                    self.logger.debug("Waiting for network to {}".format(action))
+
+                    # Recheck connection every two seconds
+                    await asyncio.sleep(2)
+        except asyncio.TimeoutError:
+            return "Did not {} internet within {} seconds".format(action, timeout)
+        return None
+
+    async def _wait_for_iot_connection(self, timeout: float) -> None:
+        """Waits for iot manager to connect to cloud, logs a warning on timeout."""
+        try:
+            async with async_timeout.timeout(timeout):
+                while not self.iot_is_connected:
+                    await asyncio.sleep(2)
+        except asyncio.TimeoutError:
+            message = "IoT manager did not connect to cloud after completing raspi registration"
+            self.logger.warning(message)
 
-            # Initialize timing variables
-            timeout = 120  # seconds
-            start_time = time.time()
+    def update_connection(self) -> None:
+        """Updates connection state. Ip address and wifi ssids are only refetched once
+        their cached values expire, the connection status changes, or netlink reports
+        a change."""
+        self._last_update_time = time.monotonic()
+
+        # Refetch values netlink reported as changed, address changes affect the ip
+        # address and link changes can also affect visible wifi ssids
+        if self._netlink_changed:
+            self._network_cache["ip_address"] = (0.0, None)
+            if self._netlink_link_changed:
+                self._network_cache["wifi_ssids"] = (0.0, None)
+        self._netlink_changed = False
+        self._netlink_link_changed = False
+        is_connected = self.network_utilities.is_connected()
+        self.logger.debug("Is connected: {}".format(is_connected))
+        self._track_connection(is_connected)
+        if is_connected:
+
+            # Ip address only changes with connection status or a netlink address
+            # change, both drop the cached value. Without netlink refetch every update
+            ip_address_ttl = float("inf") if self._netlink is not None else 0.0
+            ip_address = self._get_cached(
+                "ip_address", ip_address_ttl, self.network_utilities.get_ip_address
+            )
+        else:
+            ip_address = "UNKNOWN"
 
-            # Wait for iot to connect to timeout
-            while time.time() - start_time < timeout:
+        wifi_ssids = self._get_cached(
+            "wifi_ssids", WIFI_SSIDS_CACHE_TTL, self.network_utilities.get_wifi_ssids
+        )
 
-                # Check if iot manager has connected yet
-                if self.iot_is_connected:
-                    return
+        # Update shared state in a single critical section
+        self._update_state_batch(
+            is_connected=is_connected, ip_address=ip_address, wifi_ssids=wifi_ssids
+        )
 
-                # Update every 2 seconds
-                time.sleep(2)
+    def _track_connection(self, value: bool) -> None:
+        """Tracks connection status, updates reconnection status, and logs changes."""
 
-            # Handle timeout events
-            message = "IoT manager did not connect to cloud after completing raspi registration"
-            self.logger.warning(message)
+        # Set previous and current connection state
+        prev_connected = self._connected
+        self._connected = value
 
-    ##### HELPER FUNCTIONS #############################################################
+        # Check for new connection
+        if prev_connected != self._connected and self._connected:
+            self.logger.info("Connected to internet")
+            self.reconnected = True
+            self._request_transition(modes.CONNECTED)
+            self._invalidate_network_cache()
 
-    def update_connection(self) -> None:
-        """Updates connection state."""
-        self.is_connected = self.network_utilities.is_connected()
-        self.logger.debug("Is connected: {}".format(self.is_connected))
-        if self.is_connected:
-            self.ip_address = self.network_utilities.get_ip_address()
+        # Check for new disconnection
+        elif prev_connected != self._connected and not self._connected:
+            self.logger.info("Disconnected from internet")
+            self.reconnected = False
+            self._request_transition(modes.DISCONNECTED)
+            self._invalidate_network_cache()
+
+        # No change to connection
         else:
-            self.ip_address = "UNKNOWN"
+            self.reconnected = False
+
+    def _update_state_batch(self, **kwargs: Any) -> None:
+        """Safely updates multiple values in shared network state under one lock."""
+        with self._network_lock:
+            self._net.update(kwargs)
 
-        self.wifi_ssids = self.network_utilities.get_wifi_ssids()
+    def _get_cached(self, key: str, ttl: float, function: Callable[[], T]) -> T:
+        """Gets value from network cache, refetches value if cached value expired."""
+        timestamp, value = self._network_cache[key]
+        if value is None or time.monotonic() - timestamp > ttl:
+            value = function()
+            self._network_cache[key] = (time.monotonic(), value)
+        return value  # type: ignore
+
+    def _invalidate_network_cache(self) -> None:
+        """Invalidates network cache so values are refetched on next update."""
+        self._network_cache = {"ip_address": (0.0, None), "wifi_ssids": (0.0, None)}
 
     # def _enable_raspi_access_point(self) -> None:
     #     """Enables raspberry pi access point."""
@@ -315,7 +690,18 @@ class NetworkManager(manager.StateMachineManager):
 
     ##### EVENT FUNCTIONS ##############################################################
 
+    def shutdown(self) -> Tuple[str, int]:
+        """Pre-processes shutdown event, waking state machine to process it."""
+        message, status = super().shutdown()
+        self._notify_wake()
+        return message, status
+
     def join_wifi(self, request: Dict[str, Any]) -> Tuple[str, int]:
+        """Joins wifi. Blocks until join completes on event loop."""
+        coroutine = self._join_wifi(request)
+        return self._run_coroutine(coroutine, (CLOSED_MESSAGE, 503))  # type: ignore
+
+    async def _join_wifi(self, request: Dict[str, Any]) -> Tuple[str, int]:
         """ Joins wifi."""
         self.logger.debug("Joining wifi")
 
@@ -330,43 +716,43 @@ class NetworkManager(manager.StateMachineManager):
         # Join wifi
         self.logger.debug("Sending join wifi request")
         try:
-            self.network_utilities.join_wifi(wifi_ssid, wifi_password)
+            await self._run_blocking(
+                self.network_utilities.join_wifi, wifi_ssid, wifi_password
+            )
+        except asyncio.CancelledError:
+            raise  # cancelled by close, subclasses Exception before python 3.8
         except Exception as e:
             message = "Unable to join wifi, unhandled exception: {}".format(type(e))
             self.logger.exception(message)
             return message, 500
 
         # Wait for internet connection to be established
-        timeout = 60  # seconds
-        start_time = time.time()
-        while not self.network_utilities.is_connected():
-            self.logger.debug("Waiting for network connection")
-
-            # Check for timeout
-            if time.time() - start_time > timeout:
-                message = "Did not connect to internet within {} ".format(timeout)
-                message += "seconds of joining wifi"
-                self.logger.warning(message)
-
-                # TODO: Remove RaspberryPi specific code
-                # Remove failed wifi entry and re-enable raspi access point
-                # if "raspberry-pi" in str(os.getenv("PLATFORM")):
-                #    self.network_utilities.remove_raspi_prev_wifi_entry()
-                #    self._enable_raspi_access_point()
+        timeout_message = await self._wait_for_connection(desired=True, timeout=60)
+        if timeout_message is not None:
+            message = timeout_message + " of joining wifi"
+            self.logger.warning(message)
 
-                return message, 202
+            # TODO: Remove RaspberryPi specific code
+            # Remove failed wifi entry and re-enable raspi access point
+            # if IS_RASPBERRY_PI:
+            #    self.network_utilities.remove_raspi_prev_wifi_entry()
+            #    self._enable_raspi_access_point()
 
-            # Recheck if internet is connected every second
-            time.sleep(2)
+            return message, 202
 
-        # Update connection state
-        self.is_connected = True
+        # Have state machine update connection state
+        self._request_update()
 
         # Succesfully joined wifi
         self.logger.debug("Successfully joined wifi")
         return "Successfully joined wifi", 200
 
     def join_wifi_advanced(self, request: Dict[str, Any]) -> Tuple[str, int]:
+        """Joins wifi advanced. Blocks until join completes on event loop."""
+        coroutine = self._join_wifi_advanced(request)
+        return self._run_coroutine(coroutine, (CLOSED_MESSAGE, 503))  # type: ignore
+
+    async def _join_wifi_advanced(self, request: Dict[str, Any]) -> Tuple[str, int]:
         """ Joins wifi."""
         self.logger.debug("Joining wifi advanced")
 
@@ -386,9 +772,18 @@ class NetworkManager(manager.StateMachineManager):
         # Join wifi advanced
         self.logger.debug("Sending join wifi request to network utility")
         try:
-            self.network_utilities.join_wifi_advanced(
-                ssid_name, passphrase, hidden_ssid, security, eap, identity, phase2
+            await self._run_blocking(
+                self.network_utilities.join_wifi_advanced,
+                ssid_name,
+                passphrase,
+                hidden_ssid,
+                security,
+                eap,
+                identity,
+                phase2,
             )
+        except asyncio.CancelledError:
+            raise  # cancelled by close, subclasses Exception before python 3.8
         except Exception as e:
             message = "Unable to join wifi advanced, unhandled exception: {}".format(
                 type(e)
@@ -397,69 +792,62 @@ class NetworkManager(manager.StateMachineManager):
             return message, 500
 
         # Wait for internet connection to be established
-        timeout = 60  # seconds
-        start_time = time.time()
-        while not self.network_utilities.is_connected():
-            self.logger.debug("Waiting for network to connect")
-
-            # Check for timeout
-            if time.time() - start_time > timeout:
-                message = "Did not connect to internet within {} ".format(timeout)
-                message += "seconds of joining wifi"
-                self.logger.warning(message)
-                return message, 202
-
-            # Recheck if internet is connected every second
-            time.sleep(2)
+        timeout_message = await self._wait_for_connection(desired=True, timeout=60)
+        if timeout_message is not None:
+            message = timeout_message + " of joining wifi"
+            self.logger.warning(message)
+            return message, 202
 
-        # Update connection state
-        self.is_connected = True
+        # Have state machine update connection state
+        self._request_update()
 
         # Succesfully joined wifi advanced
         self.logger.debug("Successfully joined wifi advanced")
         return "Successfully joined wifi advanced", 200
 
     def delete_wifis(self) -> Tuple[str, int]:
+        """Deletes wifis. Blocks until delete completes on event loop."""
+        coroutine = self._delete_wifis()
+        return self._run_coroutine(coroutine, (CLOSED_MESSAGE, 503))  # type: ignore
+
+    async def _delete_wifis(self) -> Tuple[str, int]:
         """ Deletes wifi."""
         self.logger.debug("Deleting wifis")
 
         # Join wifi
         try:
-            self.network_utilities.delete_wifis()
+            await self._run_blocking(self.network_utilities.delete_wifis)
+        except asyncio.CancelledError:
+            raise  # cancelled by close, subclasses Exception before python 3.8
         except Exception as e:
             message = "Unable to delete wifi, unhandled exception: {}".format(type(e))
             self.logger.exception(message)
             return message, 500
 
         # Wait for internet to be disconnected
-        timeout = 10  # seconds
-        start_time = time.time()
-        while self.network_utilities.is_connected():
-            self.logger.debug("Waiting for internet to disconnect")
-
-            # Check for timeout
-            if time.time() - start_time > timeout:
-                message = "Did not disconnect from internet within {} ".format(timeout)
-                message += "seconds of deleting wifis"
-                self.logger.warning(message)
-                return message, 202
-
-            # Recheck if internet is connected every second
-            time.sleep(2)
+        timeout_message = await self._wait_for_connection(desired=False, timeout=10)
+        if timeout_message is not None:
+            message = timeout_message + " of deleting wifis"
+            self.logger.warning(message)
+            return message, 202
 
-        # Update connection state
-        self.is_connected = False
+        # Have state machine update connection state
+        self._request_update()
 
         # Succesfully deleted wifi
         self.logger.debug("Successfully deleted wifis")
         return "Successfully deleted wifis", 200
 
     # def disable_raspi_access_point(self) -> Tuple[str, int]:
+    #     """Disables raspberry pi access point. Blocks until complete on event loop."""
+    #     return self._run_coroutine(self._disable_raspi_access_point_event())
+    #
+    # async def _disable_raspi_access_point_event(self) -> Tuple[str, int]:
     #     """Disables raspberry pi access point."""
     #     self.logger.debug("Disabling raspberry pi access point")
     #
     #     try:
-    #         self._disable_raspi_access_point()
+    #         await self._run_blocking(self._disable_raspi_access_point)
     #     except Exception as e:
     #         message = "Unable to disable raspi access point, unhandled exception: {}".format(
     #             type(e)
@@ -468,23 +856,14 @@ class NetworkManager(manager.StateMachineManager):
     #         return message, 500
     #
     #     # Wait for internet connection to be established
-    #     timeout = 60  # seconds
-    #     start_time = time.time()
-    #     while not self.network_utilities.is_connected():
-    #         self.logger.debug("Waiting for network connection")
-    #
-    #         # Check for timeout
-    #         if time.time() - start_time > timeout:
-    #             message = "Did not connect to internet within {} ".format(timeout)
-    #             message += "seconds of joining wifi, recheck if internet is connected"
-    #             self.logger.warning(message)
-    #             return message, 202
-    #
-    #         # Recheck if internet is connected every second
-    #         time.sleep(2)
+    #     timeout_message = await self._wait_for_connection(desired=True, timeout=60)
+    #     if timeout_message is not None:
+    #         message = timeout_message + " of joining wifi, recheck if internet is connected"
+    #         self.logger.warning(message)
+    #         return message, 202
     #
-    #     # Update connection state
-    #     self.is_connected = True
+    #     # Have state machine update connection state
+    #     self._request_update()
     #
     #     # Succesfully joined wifi
     #     self.logger.debug("Successfully disabled raspberry pi access point")
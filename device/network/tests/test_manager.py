@@ -0,0 +1,352 @@
+# Import standard python libraries
+import os, sys, pytest, selectors, socket, struct, threading, time
+
+# Import python types
+from typing import Dict, List, Tuple
+
+# Set system path
+sys.path.append(os.environ["PROJECT_ROOT"])
+
+# Import device utilities
+from device.utilities.state.main import State
+
+# Import manager elements
+from device.network.manager import NetworkManager, NETLINK_UPDATE_MIN_INTERVAL
+from device.network.manager import RTM_NEWLINK, IFLA_WIRELESS, CLOSED_MESSAGE
+from device.network import modes
+
+
+# Initialize netlink address message type, manager only needs link types
+RTM_NEWADDR = 20
+
+
+def netlink_message(type_: int, attributes: bytes = b"") -> bytes:
+    """Builds netlink message with an empty interface info body."""
+    body = bytes(16) + attributes
+    return struct.pack("=IHHII", 16 + len(body), type_, 0, 0, 0) + body
+
+
+def replace_netlink_socket(manager: NetworkManager) -> socket.socket:
+    """Stands in a socket pair for the kernel netlink socket, returns kernel end."""
+    netlink, kernel = socket.socketpair()
+    netlink.setblocking(False)
+    selector = manager._selector
+    if manager._netlink is not None:
+        if selector is not None:
+            selector.unregister(manager._netlink)
+        manager._netlink.close()
+    if selector is not None:
+        selector.register(netlink, selectors.EVENT_READ, "netlink")
+    manager._netlink = netlink
+    return kernel
+
+
+def test_init() -> None:
+    state = State()
+    manager = NetworkManager(state)
+    assert manager.mode == modes.DISCONNECTED
+    manager.close()
+
+
+def test_wait_for_wake_returns_when_notified() -> None:
+    state = State()
+    manager = NetworkManager(state)
+    manager._notify_wake()
+    start_time = time.time()
+    manager._wait_for_wake(10)
+    assert time.time() - start_time < 1
+    manager.close()
+
+
+def test_wait_for_wake_times_out() -> None:
+    state = State()
+    manager = NetworkManager(state)
+    start_time = time.time()
+    manager._wait_for_wake(0.1)
+    assert time.time() - start_time >= 0.1
+    manager.close()
+
+
+def test_wait_for_wake_netlink_event_flags_change() -> None:
+    state = State()
+    manager = NetworkManager(state)
+    selector = manager._selector
+    if selector is None or manager._netlink is None:
+        manager.close()
+        pytest.skip("netlink unavailable")
+        return
+
+    kernel = replace_netlink_socket(manager)
+    kernel.send(netlink_message(RTM_NEWLINK))
+
+    start_time = time.time()
+    manager._wait_for_wake(10)
+    assert time.time() - start_time < 1
+    assert manager._netlink_changed
+    assert manager._netlink_link_changed
+    assert not manager._update_requested
+    manager.close()
+    kernel.close()
+
+
+def test_drain_netlink_ignores_address_and_wireless_events() -> None:
+    state = State()
+    manager = NetworkManager(state)
+    kernel = replace_netlink_socket(manager)
+    wireless = struct.pack("=HH", 8, IFLA_WIRELESS) + bytes(4)
+    kernel.send(netlink_message(RTM_NEWADDR) + netlink_message(RTM_NEWLINK, wireless))
+    assert not manager._drain_netlink()
+    kernel.send(netlink_message(RTM_NEWADDR) + netlink_message(RTM_NEWLINK))
+    assert manager._drain_netlink()
+    manager.close()
+    kernel.close()
+
+
+def test_request_update_wakes_loop() -> None:
+    state = State()
+    manager = NetworkManager(state)
+    manager._request_update()
+    start_time = time.time()
+    manager._wait_for_wake(10)
+    assert time.time() - start_time < 1
+    assert manager._update_requested
+    manager.close()
+
+
+def test_close_stops_loop_thread() -> None:
+    state = State()
+    manager = NetworkManager(state)
+    manager.close()
+    assert not manager._loop_thread.is_alive()
+    assert manager._selector == None
+    manager._notify_wake()
+    manager.close()
+
+
+def test_shutdown() -> None:
+    state = State()
+    manager = NetworkManager(state)
+    message, status = manager.shutdown()
+    assert status == 200
+    manager.check_events()
+    assert manager.mode == modes.SHUTDOWN
+    manager.close()
+
+
+def test_join_wifi_invalid_parameter() -> None:
+    state = State()
+    manager = NetworkManager(state)
+    message, status = manager.join_wifi({"wifi_ssid": "Junk"})
+    assert status == 400
+    manager.close()
+
+
+def test_join_wifi_advanced_invalid_parameter() -> None:
+    state = State()
+    manager = NetworkManager(state)
+    message, status = manager.join_wifi_advanced({"ssid_name": "Junk"})
+    assert status == 400
+    manager.close()
+
+
+def test_wait_for_iot_connection_times_out() -> None:
+    state = State()
+    manager = NetworkManager(state)
+    start_time = time.time()
+    coroutine = manager._wait_for_iot_connection(timeout=0.1)
+    manager._run_coroutine(coroutine, None)  # type: ignore
+    assert time.time() - start_time < 1
+    manager.close()
+
+
+class CountingNetworkUtility:
+    """Network utility stand-in that counts calls."""
+
+    def __init__(self) -> None:
+        self.calls = {"ip_address": 0, "wifi_ssids": 0}
+
+    def is_connected(self) -> bool:
+        return True
+
+    def get_ip_address(self) -> str:
+        self.calls["ip_address"] += 1
+        return "127.0.0.1"
+
+    def get_wifi_ssids(self) -> List[Dict[str, str]]:
+        self.calls["wifi_ssids"] += 1
+        return []
+
+
+class DisconnectedNetworkUtility(CountingNetworkUtility):
+    """Network utility stand-in that reports no internet connection."""
+
+    def is_connected(self) -> bool:
+        return False
+
+
+def test_shutdown_wins_over_connection_change() -> None:
+    state = State()
+    manager = NetworkManager(state)
+    manager.network_utilities = DisconnectedNetworkUtility()  # type: ignore
+    manager._connected = True
+    manager.mode = modes.CONNECTED
+    manager.shutdown()
+    manager.run_connected_mode()
+    assert manager.mode == modes.SHUTDOWN
+    assert manager.event_queue.empty()
+    manager.close()
+
+
+class BlockingNetworkUtility(CountingNetworkUtility):
+    """Network utility stand-in whose join wifi blocks until released."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.joining = threading.Event()
+        self.release = threading.Event()
+
+    def join_wifi(self, ssid: str, password: str) -> None:
+        self.joining.set()
+        self.release.wait(10)
+
+
+def test_close_releases_pending_join_wifi() -> None:
+    state = State()
+    manager = NetworkManager(state)
+    network_utilities = BlockingNetworkUtility()
+    manager.network_utilities = network_utilities  # type: ignore
+    request = {"wifi_ssid": "Junk", "wifi_password": "Junk"}
+    results: List[Tuple[str, int]] = []
+    thread = threading.Thread(target=lambda: results.append(manager.join_wifi(request)))
+    thread.start()
+    assert network_utilities.joining.wait(5)
+    manager.close()
+    thread.join(5)
+    network_utilities.release.set()
+    assert not thread.is_alive()
+    assert results == [(CLOSED_MESSAGE, 503)]
+
+
+def test_join_wifi_after_close() -> None:
+    state = State()
+    manager = NetworkManager(state)
+    manager.close()
+    message, status = manager.join_wifi({"wifi_ssid": "Junk", "wifi_password": "Junk"})
+    assert message == CLOSED_MESSAGE
+    assert status == 503
+
+
+def test_update_connection_caches_network_values() -> None:
+    state = State()
+    manager = NetworkManager(state)
+    kernel = replace_netlink_socket(manager)
+    network_utilities = CountingNetworkUtility()
+    manager.network_utilities = network_utilities  # type: ignore
+    manager.update_connection()
+    manager.update_connection()
+    assert manager.ip_address == "127.0.0.1"
+    assert network_utilities.calls == {"ip_address": 1, "wifi_ssids": 1}
+    manager.close()
+    kernel.close()
+
+
+def test_update_connection_refetches_ip_address_without_netlink() -> None:
+    state = State()
+    manager = NetworkManager(state)
+    netlink, manager._netlink = manager._netlink, None
+    network_utilities = CountingNetworkUtility()
+    manager.network_utilities = network_utilities  # type: ignore
+    manager.update_connection()
+    manager.update_connection()
+    assert network_utilities.calls == {"ip_address": 2, "wifi_ssids": 1}
+    manager._netlink = netlink
+    manager.close()
+
+
+def test_update_connection_refetches_on_connection_change() -> None:
+    state = State()
+    manager = NetworkManager(state)
+    network_utilities = CountingNetworkUtility()
+    manager.network_utilities = network_utilities  # type: ignore
+    manager.update_connection()
+    manager.is_connected = False
+    manager.update_connection()
+    assert network_utilities.calls == {"ip_address": 2, "wifi_ssids": 2}
+    manager.close()
+
+
+def test_netlink_change_refetches_network_values() -> None:
+    state = State()
+    manager = NetworkManager(state)
+    network_utilities = CountingNetworkUtility()
+    manager.network_utilities = network_utilities  # type: ignore
+    manager.update_connection()
+    manager._netlink_changed = True
+    manager.update_connection()
+    assert network_utilities.calls == {"ip_address": 2, "wifi_ssids": 1}
+    manager._netlink_changed = True
+    manager._netlink_link_changed = True
+    manager.update_connection()
+    assert network_utilities.calls == {"ip_address": 3, "wifi_ssids": 2}
+    manager.close()
+
+
+def test_netlink_change_waits_for_minimum_interval() -> None:
+    state = State()
+    manager = NetworkManager(state)
+    manager.network_utilities = CountingNetworkUtility()  # type: ignore
+    deadline = time.monotonic() + 300
+    manager._netlink_changed = True
+    assert manager._next_update_time(deadline) < time.monotonic()
+    manager.update_connection()
+    assert manager._next_update_time(deadline) == deadline
+    manager._netlink_changed = True
+    expected = manager._last_update_time + NETLINK_UPDATE_MIN_INTERVAL
+    assert manager._next_update_time(deadline) == expected
+    manager.close()
+
+
+def test_run_invalid_mode_shutdown() -> None:
+    state = State()
+    manager = NetworkManager(state)
+    manager.mode = "Junk"
+    manager.run()
+    assert manager.mode == modes.INVALID
+    assert manager.is_shutdown
+
+
+def test_run_shutdown_mode() -> None:
+    state = State()
+    manager = NetworkManager(state)
+    manager.mode = modes.SHUTDOWN
+    manager.run()
+    assert manager.is_shutdown
+    assert not manager._loop_thread.is_alive()
+
+
+def test_wait_for_connection() -> None:
+    state = State()
+    manager = NetworkManager(state)
+    manager.network_utilities = CountingNetworkUtility()  # type: ignore
+    coroutine = manager._wait_for_connection(desired=True, timeout=1)
+    assert manager._run_coroutine(coroutine, "") == None  # type: ignore
+    manager.close()
+
+
+def test_wait_for_connection_times_out() -> None:
+    state = State()
+    manager = NetworkManager(state)
+    manager.network_utilities = CountingNetworkUtility()  # type: ignore
+    coroutine = manager._wait_for_connection(desired=False, timeout=0.1)
+    message = manager._run_coroutine(coroutine, "")  # type: ignore
+    assert message == "Did not disconnect from internet within 0.1 seconds"
+    manager.close()
+
+
+def test_connection_change_delivers_pending_mode() -> None:
+    state = State()
+    manager = NetworkManager(state)
+    manager.is_connected = True
+    assert manager._take_pending_mode() == modes.CONNECTED
+    assert manager._take_pending_mode() == None
+    manager.close()
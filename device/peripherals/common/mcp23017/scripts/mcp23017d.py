@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+
+# Import standard python modules
+import os, socketserver
+
+# Import usb-to-i2c communication modules
+from pyftdi.i2c import I2cController
+
+# Initialize socket path and one byte replies
+SOCKET_PATH = "/tmp/mcp23017.sock"
+ACK = b"\x06"
+NAK = b"\x15"
+
+# Ensure virtual environment is activated
+if os.getenv("VIRTUAL_ENV") == None:
+    print("Please activate your virtual environment then re-run script")
+    exit(0)
+
+# Ensure platform info is sourced
+if os.getenv("PLATFORM") == None:
+    print("Please source your platform info then re-run script")
+    exit(0)
+
+# Ensure platform is usb-to-i2c enabled
+if os.getenv("IS_USB_I2C_ENABLED") != "true":
+    print("Platform is not usb-to-i2c enabled")
+    exit(0)
+
+# Initialize i2c instance once for the lifetime of the daemon
+print("I2C cable init...")
+i2c_controller = I2cController()
+i2c_controller.configure("ftdi://ftdi:232h/1")
+
+
+class WriteHandler(socketserver.StreamRequestHandler):
+    """Handles line based `WRITE <addr> <byte0> <byte1> ...` commands, replies with
+    a one byte ACK or NAK per command."""
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            try:
+                command, address, *data = line.decode().split()
+                if command != "WRITE":
+                    raise ValueError("Unknown command `{}`".format(command))
+                i2c = i2c_controller.get_port(int(address, 16))
+                i2c.write([int(byte, 16) for byte in data])
+            except Exception as e:
+                print("Unable to process `{}`: {}".format(line.strip(), e))
+                self.wfile.write(NAK)
+                continue
+            self.wfile.write(ACK)
+
+
+# Remove stale socket from a previous run
+if os.path.exists(SOCKET_PATH):
+    os.remove(SOCKET_PATH)
+
+# Serve until interrupted
+print("Listening on {}".format(SOCKET_PATH))
+server = socketserver.UnixStreamServer(SOCKET_PATH, WriteHandler)
+try:
+    server.serve_forever()
+finally:
+    server.server_close()
+    os.remove(SOCKET_PATH)
+    i2c_controller.terminate()
@@ -1,16 +1,44 @@
 #!/usr/bin/env python3
 
 # Import standard python modules
-import os, time, sys
+import argparse, os, time, sys, socket
 
-if len(sys.argv) < 4:  # no command line args
-    print(
-        "Please provide the MCP address (0x47), port (0 to 7) and output(0 to 0xFF) on the command line"
-    )
-    exit(1)
 
-# Import usb-to-i2c communication modules
-from pyftdi.i2c import I2cController
+def hex_int(string: str) -> int:
+    """Parses a hex string, e.g. `0x47` or `47`."""
+    return int(string, 16)
+
+
+# Parse command line before anything slow so invalid input fails fast
+parser = argparse.ArgumentParser(description="Sets MCP23017 port outputs")
+parser.add_argument("address", type=hex_int, help="MCP address, e.g. 0x47")
+parser.add_argument(
+    "ports",
+    nargs="+",
+    help="port (0 to 7) and output (0 to 0xFF) as `port output` or as one or "
+    "more `port:output` pairs, e.g. 0:0xFF 1:0x0F",
+)
+args = parser.parse_args()
+address = args.address
+
+# Get the (port, value) pairs from the command line, values are in hex
+try:
+    if len(args.ports) == 2 and ":" not in args.ports[0]:
+        pairs = [(int(args.ports[0]), hex_int(args.ports[1]))]
+    else:
+        pairs = []
+        for arg in args.ports:
+            port, value = arg.split(":")
+            pairs.append((int(port), hex_int(value)))
+except ValueError:
+    parser.error("invalid port output pairs: {}".format(" ".join(args.ports)))
+
+# Validate ports and outputs
+for port, value in pairs:
+    if port not in range(8):
+        parser.error("port must be 0 to 7, got {}".format(port))
+    if value not in range(0x100):
+        parser.error("output must be 0 to 0xFF, got 0x{:X}".format(value))
 
 # Ensure virtual environment is activated
 if os.getenv("VIRTUAL_ENV") == None:
@@ -27,21 +55,37 @@ if os.getenv("IS_USB_I2C_ENABLED") != "true":
     print("Platform is not usb-to-i2c enabled")
     exit(0)
 
+# Send writes through mcp23017d.py if it is running, it keeps the ftdi device open
+try:
+    daemon = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    daemon.connect("/tmp/mcp23017.sock")
+except OSError:
+    daemon.close()
+else:
+    print("I2C address 0x{:2X} via mcp23017d".format(address))
+    for port, value in pairs:
+        print("Port={} value={}/0x{:2X}".format(port, value, value))
+        command = "WRITE 0x{:02X} 0x{:02X} 0x{:02X} 0x00\n".format(
+            address, 0x30 + port, value
+        )
+        daemon.sendall(command.encode())
+        if daemon.recv(1) != b"\x06":
+            print("Daemon was unable to set port {}".format(port))
+            exit(1)
+    daemon.close()
+    exit(0)
+
+# Import usb-to-i2c communication modules
+from pyftdi.i2c import I2cController
+
 # Initialize i2c instance
 print("I2C cable init...")
 i2c_controller = I2cController()
 i2c_controller.configure("ftdi://ftdi:232h/1")
-address = int(sys.argv[1], 16)
 print("I2C address 0x{:2X}".format(address))
 i2c = i2c_controller.get_port(address)
 
-# Get the port from the command line
-port = int(sys.argv[2])
-byte = 0x30 + port
-
-# Get the value in hex from the command line
-value = int(sys.argv[3], 16)
-
-# Set the port high
-print("Port={} value={}/0x{:2X}".format(port, value, value))
-i2c.write([byte, value, 0x00])
+# Set each port in the same i2c session, device takes one command per transaction
+for port, value in pairs:
+    print("Port={} value={}/0x{:2X}".format(port, value, value))
+    i2c.write([0x30 + port, value, 0x00])
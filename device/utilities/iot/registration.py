@@ -3,6 +3,7 @@ import os, subprocess, shutil
 
 # Import device utilities
 from device.utilities.logger import Logger
+from device.utilities.iot import tokens
 from device.utilities.network.network_utility_factory import NetworkUtilityFactory
 
 from django.conf import settings
@@ -49,8 +50,7 @@ def device_id() -> str:
     except FileNotFoundError:
         return "UNKNOWN"
     except Exception as e:
-        message = "Unable to get device id, unhandled exception: {}".format(type(e))
-        logger.exception(message)
+        logger.exception("Unable to get device id, unhandled exception: %s", type(e))
         return "UNKNOWN"
 
 
@@ -64,10 +64,9 @@ def verification_code() -> str:
     except FileNotFoundError:
         return "INVALID"
     except Exception as e:
-        message = "Unable to get verification code, unhandled exception: {}".format(
-            type(e)
+        logger.exception(
+            "Unable to get verification code, unhandled exception: %s", type(e)
         )
-        logger.exception(message)
         return "INVALID"
 
 
@@ -94,8 +93,7 @@ def register() -> None:
         subprocess.run(make_directory_command)
         subprocess.run(register_command)
     except Exception as e:
-        message = "Unable to register, unhandled exception: {}".format(type(e))
-        logger.exception(message)
+        logger.exception("Unable to register, unhandled exception: %s", type(e))
 
 
 def delete() -> None:
@@ -104,3 +102,6 @@ def delete() -> None:
 
     if os.path.exists(REGISTRATION_DATA_DIR):
         shutil.rmtree(REGISTRATION_DATA_DIR)
+
+    # Drop tokens signed with the deleted private key
+    tokens.clear_cache()
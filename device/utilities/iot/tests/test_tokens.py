@@ -1,6 +1,14 @@
 # Import standard python libraries
 import os, sys, pytest, time
 
+# Import python types
+from typing import Any
+
+# Import cryptography modules
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
 # Set system path
 sys.path.append(os.environ["PROJECT_ROOT"])
 
@@ -10,3 +18,59 @@ from device.utilities.iot import tokens
 
 def test_init() -> None:
     assert True
+
+
+def write_private_key(directory: Any) -> str:
+    """Writes a new rsa private key to directory, returns its filepath."""
+    private_key = rsa.generate_private_key(
+        public_exponent=65537, key_size=2048, backend=default_backend()
+    )
+    pem = private_key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption(),
+    )
+    filepath = str(directory.join("rsa_private.pem"))
+    with open(filepath, "wb") as f:
+        f.write(pem)
+    return filepath
+
+
+def test_load_private_key_missing_file() -> None:
+    tokens.clear_cache()
+    with pytest.raises(ValueError):
+        tokens.load_private_key("junk/rsa_private.pem")
+
+
+def test_load_private_key_cached(tmpdir: Any) -> None:
+    tokens.clear_cache()
+    private_key_filepath = write_private_key(tmpdir)
+    private_key = tokens.load_private_key(private_key_filepath)
+    os.remove(private_key_filepath)
+    assert tokens.load_private_key(private_key_filepath) is private_key
+
+
+def test_create_json_web_token_cached(tmpdir: Any) -> None:
+    tokens.clear_cache()
+    private_key = tokens.load_private_key(write_private_key(tmpdir))
+    token = tokens.create_json_web_token("project", private_key)
+    assert not token.is_expired
+    assert tokens.create_json_web_token("project", private_key) is token
+
+
+def test_create_json_web_token_clear_cache(tmpdir: Any) -> None:
+    tokens.clear_cache()
+    private_key = tokens.load_private_key(write_private_key(tmpdir))
+    token = tokens.create_json_web_token("project", private_key)
+    tokens.clear_cache()
+    assert tokens.create_json_web_token("project", private_key) is not token
+
+
+def test_json_web_token_is_expired() -> None:
+    json_web_token = tokens.JsonWebToken(
+        encoded="encoded",
+        issued_timestamp=0.0,
+        expiration_timestamp=0.0,
+        expiration_monotonic=time.monotonic() - 1,
+    )
+    assert json_web_token.is_expired
@@ -1,8 +1,12 @@
 # Import standard python modules
-import datetime, jwt
+import datetime, jwt, time
+
+# Import cryptography modules
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import serialization
 
 # Import python types
-from typing import NamedTuple, Any
+from typing import NamedTuple, Any, Dict, Tuple
 
 # Import device utilities
 from device.utilities.logger import Logger
@@ -10,6 +14,10 @@ from device.utilities.logger import Logger
 # Initialize logger
 logger = Logger("IotTokenUtility", "iot")
 
+# Initialize token renewal margin, cached tokens closer than this to expiring are
+# re-issued so clients never connect with a token about to expire
+RENEWAL_MARGIN_SECONDS = 60
+
 
 class JsonWebToken(NamedTuple):
     """Dataclass for json web token."""
@@ -17,21 +25,67 @@ class JsonWebToken(NamedTuple):
     encoded: Any  # TODO: Get type
     issued_timestamp: float
     expiration_timestamp: float
+    expiration_monotonic: float  # for expiry checks, immune to clock changes
 
     @property
     def is_expired(self) -> bool:
         """Checks if token is expired."""
-        current_timestamp = datetime.datetime.utcnow().timestamp()
-        return current_timestamp > self.expiration_timestamp
+        return time.monotonic() > self.expiration_monotonic
+
+
+# Initialize caches, signing is expensive so tokens are reused until near expiry
+_json_web_tokens: Dict[Tuple[str, Any, str], JsonWebToken] = {}
+_private_keys: Dict[str, Any] = {}
+
+
+def clear_cache() -> None:
+    """Clears cached tokens and private keys, e.g. after registration changes."""
+    _json_web_tokens.clear()
+    _private_keys.clear()
+
+
+def load_private_key(private_key_filepath: str) -> Any:
+    """Loads pem private key into a reusable key object. Key is only read and parsed
+    the first time, later calls return the cached key object."""
+
+    # Check for cached private key
+    private_key = _private_keys.get(private_key_filepath)
+    if private_key is not None:
+        return private_key
+
+    # Load and parse private key
+    try:
+        with open(private_key_filepath, "rb") as f:
+            pem = f.read()
+        private_key = serialization.load_pem_private_key(
+            pem, password=None, backend=default_backend()
+        )
+    except FileNotFoundError:
+        message = "Unable to load private key, private key file not found"
+        logger.warning(message)
+        raise ValueError(message)
+
+    # Successfully loaded private key
+    _private_keys[private_key_filepath] = private_key
+    return private_key
 
 
 def create_json_web_token(
     project_id: str,
-    private_key_filepath: str,
+    private_key: Any,
     encryption_algorithm: str = "RS256",
     time_to_live_minutes: int = 60,
 ) -> JsonWebToken:
-    """Creates a json web token."""
+    """Creates a json web token. Returns cached token if it is not near expiry."""
+
+    # Check for cached token
+    key = (project_id, private_key, encryption_algorithm)
+    cached_token = _json_web_tokens.get(key)
+    if cached_token is not None:
+        remaining_seconds = cached_token.expiration_monotonic - time.monotonic()
+        if remaining_seconds > RENEWAL_MARGIN_SECONDS:
+            return cached_token
+
     logger.debug("Creating json web token")
 
     # Initialize token variables
@@ -42,15 +96,9 @@ def create_json_web_token(
     # Build token
     token = {"iat": issued_timestamp, "exp": expiration_timestamp, "aud": project_id}
 
-    # Load private key and encode token
+    # Encode token
     try:
-        with open(private_key_filepath, "r") as f:
-            private_key = f.read()
         encoded_jwt = jwt.encode(token, private_key, algorithm=encryption_algorithm)
-    except FileNotFoundError:
-        message = "Unable to create token, private key file not found"
-        logger.warning(message)
-        raise ValueError(message)
     except NotImplementedError:
         message = "Unable to create token, invalid encryption algorithm"
         logger.error(message)
@@ -65,7 +113,9 @@ def create_json_web_token(
         encoded=encoded_jwt,
         issued_timestamp=issued_timestamp,
         expiration_timestamp=expiration_timestamp,
+        expiration_monotonic=time.monotonic() + time_delta,
     )
+    _json_web_tokens[key] = json_web_token
 
     # Successfully created json web token
     return json_web_token
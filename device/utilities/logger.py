@@ -2,11 +2,18 @@
 import logging, sys, json, os
 
 # Import python types
-from typing import Dict, Any
+from typing import Dict, Any, Tuple
 
 from django.conf import settings
 
 
+def _format(message: str, args: Tuple[Any, ...]) -> str:
+    """ Formats message with lazy logging arguments, like a log record does. """
+    if args:
+        return str(message) % args
+    return str(message)
+
+
 class Logger:
     """Simple logger class. Ensures descriptive logs in run and test environments."""
 
@@ -17,59 +24,65 @@ class Logger:
         logger = logging.getLogger(log)
         self.logger = logging.LoggerAdapter(logger, extra)
 
-    def debug(self, message: str) -> None:
+    def debug(self, message: str, *args: Any) -> None:
         """ Reports standard logging debug message if in normal runtime
             environment. If in test environment, prepends message with
-            logger name. """
+            logger name. Formatting with args is deferred until the
+            message is emitted. """
         if "pytest" in sys.modules:
-            print("DEBUG " + self.name + ": " + str(message))
+            print("DEBUG " + self.name + ": " + _format(message, args))
         else:
-            self.logger.debug(message)
+            self.logger.debug(message, *args)
 
-    def info(self, message: str) -> None:
+    def info(self, message: str, *args: Any) -> None:
         """ Reports standard info debug message if in normal runtime
             environment. If in test environment, prepends message with
-            logger name. """
+            logger name. Formatting with args is deferred until the
+            message is emitted. """
         if "pytest" in sys.modules:
-            print("INFO " + self.name + ": " + str(message))
+            print("INFO " + self.name + ": " + _format(message, args))
         else:
-            self.logger.info(message)
+            self.logger.info(message, *args)
 
-    def warning(self, message: str) -> None:
+    def warning(self, message: str, *args: Any) -> None:
         """ Reports standard logging warning message if in normal runtime
             environment. If in test environment, prepends message with
-            logger name. """
+            logger name. Formatting with args is deferred until the
+            message is emitted. """
         if "pytest" in sys.modules:
-            print("WARNING " + self.name + ": " + str(message))
+            print("WARNING " + self.name + ": " + _format(message, args))
         else:
-            self.logger.warning(message)
+            self.logger.warning(message, *args)
 
-    def error(self, message: str) -> None:
+    def error(self, message: str, *args: Any) -> None:
         """ Reports standard logging error message if in normal runtime
             environment. If in test environment, prepends message with
-            logger name. """
+            logger name. Formatting with args is deferred until the
+            message is emitted. """
         if "pytest" in sys.modules:
-            print("ERROR " + self.name + ": " + str(message))
+            print("ERROR " + self.name + ": " + _format(message, args))
         else:
-            self.logger.error(message)
+            self.logger.error(message, *args)
 
-    def critical(self, message: str) -> None:
+    def critical(self, message: str, *args: Any) -> None:
         """ Reports standard logging critical message if in normal runtime
             environment. If in test environment, prepends message with
-            logger name. """
+            logger name. Formatting with args is deferred until the
+            message is emitted. """
         if "pytest" in sys.modules:
-            print("CRITICAL " + self.name + ": " + str(message))
+            print("CRITICAL " + self.name + ": " + _format(message, args))
         else:
-            self.logger.critical(message)
+            self.logger.critical(message, *args)
 
-    def exception(self, message: str) -> None:
+    def exception(self, message: str, *args: Any) -> None:
         """ Reports standard logging exception message if in normal runtime
             environment. If in test environment, prepends message with
-            logger name. """
+            logger name. Formatting with args is deferred until the
+            message is emitted. """
         if "pytest" in sys.modules:
-            self.logger.exception(self.name + ": " + str(message))
+            self.logger.exception(self.name + ": " + _format(message, args))
         else:
-            self.logger.exception(message)
+            self.logger.exception(message, *args)
 
 
 class PeripheralFileHandler(logging.Handler):
@@ -22,6 +22,7 @@ class State(object):
     network: Dict[str, Any] = {}
     upgrade: Dict[str, Any] = {}
     lock = threading.RLock()
+    network_lock = threading.RLock()  # guards network, independent of lock
 
     def __str__(self) -> str:
         return "State(device={}, environment={}, recipe={}, peripherals={}, controllers={}, iot={}, resource={}, network={}, upgrade={})".format(
@@ -2,7 +2,7 @@
 import logging, threading, queue, time
 
 # Import python types
-from typing import Dict, List, Tuple, Any
+from typing import Dict, Tuple, Any, Collection, Mapping
 
 # Import device utilities
 from device.utilities.logger import Logger
@@ -10,6 +10,9 @@ from device.utilities.logger import Logger
 # Import module elements
 from device.utilities.statemachine import modes, events
 
+# Initialize event batch size, bounds time spent draining the queue per check
+MAX_EVENTS_PER_CHECK = 64
+
 
 class StateMachineManager:
     """Manages state machines. Runs as a daemon thread, ensures valid transitions, 
@@ -22,7 +25,7 @@ class StateMachineManager:
         self.event_queue: queue.Queue = queue.Queue()
         self.is_shutdown: bool = False
         self._mode: str = modes.INIT
-        self.transitions: Dict[str, List[str]] = {
+        self.transitions: Mapping[str, Collection[str]] = {
             modes.INIT: [modes.NORMAL, modes.SHUTDOWN, modes.ERROR],
             modes.NORMAL: [modes.RESET, modes.SHUTDOWN, modes.ERROR],
             modes.RESET: [modes.INIT, modes.SHUTDOWN, modes.ERROR],
@@ -176,15 +179,25 @@ class StateMachineManager:
             return "Unknown event request type", 400
 
     def check_events(self) -> None:
-        """Checks for a new event. Only processes one event per call, even if there are 
-        multiple in the queue. Events are processed first-in-first-out (FIFO)."""
-
-        # Check for new events
-        if self.event_queue.empty():
-            return
-
-        # Get request
-        request = self.event_queue.get()
+        """Checks for new events. Processes up to `MAX_EVENTS_PER_CHECK` events per
+        call, stopping early once an event changes mode so the run loop sees each
+        transition. Events are processed first-in-first-out (FIFO)."""
+        mode = self.mode
+        for _ in range(MAX_EVENTS_PER_CHECK):
+
+            # Check for new events
+            try:
+                request = self.event_queue.get_nowait()
+            except queue.Empty:
+                return
+
+            # Process request, let run loop handle any mode change
+            self._process_event(request)
+            if self.mode != mode:
+                return
+
+    def _process_event(self, request: Dict[str, Any]) -> None:
+        """Processes an event request taken from the event queue."""
         self.logger.debug("Received new request: {}".format(request))
 
         # Get request parameters
@@ -219,3 +219,20 @@ def test_process_reset_invalid_mode() -> None:
     assert manager._mode == modes.INIT
     manager._reset()
     assert manager._mode != modes.RESET
+
+
+def test_check_events_processes_batch() -> None:
+    manager = StateMachineManager()
+    for _ in range(3):
+        manager.event_queue.put({"type": "Junk"})
+    manager.check_events()
+    assert manager.event_queue.empty()
+
+
+def test_check_events_stops_after_transition() -> None:
+    manager = StateMachineManager()
+    manager.shutdown()
+    manager.event_queue.put({"type": "Junk"})
+    manager.check_events()
+    assert manager.mode == modes.SHUTDOWN
+    assert not manager.event_queue.empty()
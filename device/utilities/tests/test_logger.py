@@ -0,0 +1,27 @@
+# Import standard python libraries
+import sys, os
+
+# Import python types
+from typing import Any
+
+# Set system path
+ROOT_DIR = os.environ["PROJECT_ROOT"]
+sys.path.append(ROOT_DIR)
+os.chdir(ROOT_DIR)
+
+# Import logger utility
+from device.utilities.logger import Logger
+
+
+def test_debug_formats_args(capsys: Any) -> None:
+    logger = Logger("Test", "test")
+    logger.debug("value = %s, count = %d", "abc", 3)
+    captured = capsys.readouterr()
+    assert captured.out == "DEBUG Test: value = abc, count = 3\n"
+
+
+def test_debug_without_args_keeps_percent(capsys: Any) -> None:
+    logger = Logger("Test", "test")
+    logger.debug("100% done")
+    captured = capsys.readouterr()
+    assert captured.out == "DEBUG Test: 100% done\n"